@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# Compares ways of evaluating the conditions of a control list for every element
+# of a random model: one compiled lambda per condition, the shared atom functions
+# of the controls, and the per element resolve of pySCS itself.
+#
+# usage: python benchmarks/bench_conditions.py [--elements N] [--controls FILE] [--runs R]
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+PYSCS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pySCS.py")
+
+ELEMENT_TYPES = ("Actor", "Server", "Lambda", "ExternalEntity", "Datastore", "Process", "SetOfProcesses")
+
+
+def load_pyscs():
+    spec = importlib.util.spec_from_file_location("pySCS", PYSCS)
+    module = importlib.util.module_from_spec(spec)
+    # control lists name their target classes, which are looked up in the module
+    sys.modules["pySCS"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def randomize(pyscs, rng, element):
+    # half of the boolean properties keep their default, the others get a random value
+    for name, value in pyscs._properties(element).items():
+        if isinstance(value, bool) and name != "inScope" and rng.random() < 0.5:
+            setattr(element, name, rng.random() < 0.5)
+
+
+def build(pyscs, rng, count, controls):
+    pyscs.import_control_list(controls)
+    scs = pyscs.SCS("benchmark")
+    scs.description = "condition benchmark"
+    boundaries = [pyscs.Boundary("boundary {}".format(i)) for i in range(5)]
+    elements = []
+    for i in range(count):
+        element = getattr(pyscs, ELEMENT_TYPES[i % len(ELEMENT_TYPES)])("element {}".format(i))
+        element.inBoundary = boundaries[i % len(boundaries)]
+        randomize(pyscs, rng, element)
+        elements.append(element)
+    for i in range(count):
+        randomize(pyscs, rng, pyscs.Dataflow(rng.choice(elements), rng.choice(elements), "flow {}".format(i)))
+    scs.check()
+    pyscs._index_flows(pyscs.SCS.ListOfElements)
+    pyscs.Control.load()
+
+
+def best(runs, function):
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--elements", type=int, default=20000, help="number of elements, and of dataflows (default = 20000)")
+    parser.add_argument("--controls", default="default.csv", help="control list to evaluate (default = default.csv)")
+    parser.add_argument("--runs", type=int, default=3, help="number of runs, the fastest counts (default = 3)")
+    args = parser.parse_args()
+
+    pyscs = load_pyscs()
+    with pyscs.Session():
+        build(pyscs, random.Random(1), args.elements, args.controls)
+        controls = pyscs.SCS.ListOfControls
+        elements = [e for e in pyscs.SCS.ListOfElements if e.inScope]
+        pairs = [(e, pyscs.Control.for_type(type(e))) for e in elements]
+        conditions = dict((c, eval("lambda target: ({})".format(c.condition), vars(pyscs))) for c in controls)
+
+        def compiled():
+            hits = 0
+            for e, applicable in pairs:
+                for c in applicable:
+                    try:
+                        hits += conditions[c](e) is True
+                    except AttributeError:
+                        pass
+            return hits
+
+        def shared():
+            hits = 0
+            for e, applicable in pairs:
+                values = {}
+                for c in applicable:
+                    try:
+                        hits += c._function(e, values) is True
+                    except AttributeError:
+                        pass
+            return hits
+
+        def resolve():
+            return len(list(pyscs._evaluate_controls(elements)))
+
+        # every element is evaluated on its own
+        pyscs._VECTORIZE_MIN_ELEMENTS = float("inf")
+        results = [
+            ("compiled conditions", best(args.runs, compiled)),
+            ("shared atoms", best(args.runs, shared)),
+            ("resolve", best(args.runs, resolve)),
+        ]
+    print("{} element/control pairs".format(sum(len(applicable) for e, applicable in pairs)))
+    print("{:<20} {:>10} {:>10}".format("evaluation", "time (s)", "findings"))
+    for name, (seconds, hits) in results:
+        print("{:<20} {:>10.3f} {:>10}".format(name, seconds, hits))
+
+
+if __name__ == "__main__":
+    main()
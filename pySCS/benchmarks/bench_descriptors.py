@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# Compares the WeakKeyDictionary-backed descriptors pySCS used to have with the
+# current instance-backed ones: construction time, memory and attribute reads
+# for a large number of elements.
+#
+# usage: python benchmarks/bench_descriptors.py [--elements N]
+
+import argparse
+import gc
+import importlib.util
+import os
+import time
+import tracemalloc
+from weakref import WeakKeyDictionary
+
+PYSCS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pySCS.py")
+
+PROPERTIES = ("isHardened", "sanitizesInput", "encodesOutput", "hasAccessControl", "implementsCSRFToken")
+
+
+def load_pyscs():
+    spec = importlib.util.spec_from_file_location("pySCS", PYSCS)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return vars(module)
+
+
+class LegacyVar(object):
+    # the descriptor storage pySCS used before: one WeakKeyDictionary per class attribute
+    def __init__(self, var):
+        self.var = var
+        self.default = var.default
+        self.data = WeakKeyDictionary()
+
+    def __get__(self, instance, owner):
+        return self.data.get(instance, self.default)
+
+    def __set__(self, instance, value):
+        self.var.validate(value)
+        try:
+            self.data[instance]
+        except (NameError, KeyError):
+            self.data[instance] = value
+
+
+def legacy_class(pyscs, cls):
+    attributes = {}
+    for klass in reversed(cls.__mro__):
+        for name, value in vars(klass).items():
+            if isinstance(value, pyscs["varBase"]):
+                attributes[name] = LegacyVar(value)
+    return type("Legacy" + cls.__name__, (cls,), attributes)
+
+
+def run(pyscs, cls, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    elements = []
+    # a session per run, as element names are unique within one
+    with pyscs["Session"]():
+        for i in range(count):
+            e = cls("server {}".format(i))
+            e.isHardened = i % 2 == 0
+            e.sanitizesInput = i % 3 == 0
+            e.OS = "CloudOS"
+            elements.append(e)
+    build = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    hits = 0
+    for e in elements:
+        for p in PROPERTIES:
+            if getattr(e, p) is False:
+                hits += 1
+    read = time.perf_counter() - start
+    return build, read, memory
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--elements", type=int, default=100000, help="number of elements to create (default = 100000)")
+    args = parser.parse_args()
+
+    pyscs = load_pyscs()
+    server = pyscs["Server"]
+    results = [
+        ("weakref", run(pyscs, legacy_class(pyscs, server), args.elements)),
+        ("instance", run(pyscs, server, args.elements)),
+    ]
+    print("{:<10} {:>10} {:>10} {:>12}".format("storage", "build (s)", "read (s)", "memory (MB)"))
+    for name, (build, read, memory) in results:
+        print("{:<10} {:>10.3f} {:>10.3f} {:>12.1f}".format(name, build, read, memory / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# Generates a synthetic model with N elements, M boundaries, F dataflows and C
+# controls, processes it with pySCS and times every phase separately:
+# import_control_list, Control.load, building the model, check, dfd, resolve
+# and report. The DFD is written as dot and the report as html, so neither
+# Graphviz nor pandoc is needed and it runs offline.
+#
+# usage: python benchmarks/bench_model.py [--elements N] [--boundaries M] [--flows F]
+#                                         [--controls C] [--runs R] [--seed S] [--output FILE]
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PYSCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PYSCS = os.path.join(PYSCS_DIR, "pySCS.py")
+
+PHASES = ("import_control_list", "load", "build", "check", "dfd", "resolve", "report")
+
+ELEMENT_TYPES = ("Actor", "Server", "Lambda", "ExternalEntity", "Datastore", "Process", "SetOfProcesses")
+
+# values string properties are set to; the first ones are what the controls look for
+STRING_VALUES = {
+    "protocol": ["HTTP", "HTTPS", "SSH"],
+    "dataType": ["XML", "JSON", ""],
+    "authenticationScheme": ["Basic", "OAuth", "Kerberos"],
+    "OS": ["Linux", "Windows", "CloudOS"],
+}
+
+MODEL_HEADER = '''import json
+import time
+
+_timings = {{}}
+
+def _timed(phase, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    _timings[phase] = time.perf_counter() - start
+    return result
+
+_timed("import_control_list", import_control_list, {controls!r})
+scs = _timed("load", SCS, "benchmark")
+scs.description = "synthetic benchmark model"
+_start = time.perf_counter()
+'''
+
+MODEL_FOOTER = '''_timings["build"] = time.perf_counter() - _start
+_timed("check", scs.check)
+_timed("dfd", scs.dfd)
+_timed("resolve", scs.resolve)
+_timed("report", scs.report)
+with open({result!r}, "w") as _f:
+    json.dump({{"timings": _timings, "findings": len(SCS.ListOfFindings)}}, _f)
+'''
+
+
+def load_pyscs():
+    spec = importlib.util.spec_from_file_location("pySCS", PYSCS)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return vars(module)
+
+
+def properties(pyscs, cls):
+    # the boolean and string properties of an element class, as declared by its descriptors
+    bools, strings = [], []
+    for klass in reversed(cls.__mro__):
+        for name, value in vars(klass).items():
+            if isinstance(value, pyscs["varBool"]) and name != "inScope":
+                bools.append(name)
+            elif isinstance(value, pyscs["varString"]) and name in STRING_VALUES:
+                strings.append(name)
+    return sorted(set(bools)), sorted(set(strings))
+
+
+def condition(rng, bools, strings):
+    atoms = []
+    for i in range(rng.randint(1, 3)):
+        if strings and rng.random() < 0.2:
+            name = rng.choice(strings)
+            atoms.append("target.{} == {!r}".format(name, STRING_VALUES[name][0]))
+        else:
+            atoms.append("target.{} is {}".format(rng.choice(bools), rng.random() < 0.7 and "False" or "True"))
+    return rng.choice((" and ", " or ")).join(atoms)
+
+
+def generate_controls(rng, pyscs, count):
+    classes = dict((t, properties(pyscs, pyscs[t])) for t in ELEMENT_TYPES + ("Dataflow",))
+    lines = ["ID;Description;Target;Condition;Mitigation"]
+    for i in range(count):
+        target = rng.choice([t for t, (bools, strings) in classes.items() if bools])
+        bools, strings = classes[target]
+        lines.append("BM{:05};Synthetic control {};{};{};".format(i, i, target, condition(rng, bools, strings)))
+    return "\n".join(lines) + "\n"
+
+
+def set_properties(rng, lines, variable, bools, strings):
+    # half of the properties keep their default, the others get a random value
+    for name in bools:
+        if rng.random() < 0.5:
+            lines.append("{}.{} = {}".format(variable, name, rng.random() < 0.5))
+    for name in strings:
+        if rng.random() < 0.5:
+            lines.append("{}.{} = {!r}".format(variable, name, rng.choice(STRING_VALUES[name])))
+
+
+def generate_model(rng, pyscs, args, controls_file, result_file):
+    lines = [MODEL_HEADER.format(controls=controls_file)]
+    for i in range(args.boundaries):
+        lines.append("b{} = Boundary('boundary {}')".format(i, i))
+    elements = []
+    for i in range(args.elements):
+        element_type = rng.choice(ELEMENT_TYPES)
+        variable = "e{}".format(i)
+        elements.append(variable)
+        lines.append("{} = {}('{} {}')".format(variable, element_type, element_type, i))
+        if args.boundaries and rng.random() < 0.8:
+            lines.append("{}.inBoundary = b{}".format(variable, rng.randrange(args.boundaries)))
+        if rng.random() < 0.1:
+            lines.append("{}.inScope = False".format(variable))
+        set_properties(rng, lines, variable, *properties(pyscs, pyscs[element_type]))
+    flow_properties = properties(pyscs, pyscs["Dataflow"])
+    for i in range(args.flows if elements else 0):
+        variable = "f{}".format(i)
+        lines.append("{} = Dataflow({}, {}, 'flow {}')".format(variable, rng.choice(elements), rng.choice(elements), i))
+        set_properties(rng, lines, variable, *flow_properties)
+    lines.append(MODEL_FOOTER.format(result=result_file))
+    return "\n".join(lines)
+
+
+def run(folder, result_file):
+    command = [sys.executable, PYSCS, folder, "--dot", "--format", "html", "--nocache"]
+    result = subprocess.run(command, cwd=PYSCS_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        sys.exit("pySCS failed:\n{}".format(result.stderr))
+    with open(result_file) as f:
+        return json.load(f)
+
+
+def commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=PYSCS_DIR, stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--elements", type=int, default=2000, help="number of elements (default = 2000)")
+    parser.add_argument("--boundaries", type=int, default=20, help="number of boundaries (default = 20)")
+    parser.add_argument("--flows", type=int, default=4000, help="number of dataflows (default = 4000)")
+    parser.add_argument("--controls", type=int, default=200, help="number of controls (default = 200)")
+    parser.add_argument("--runs", type=int, default=3, help="number of runs (default = 3)")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the generated model (default = 1)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pyscs = load_pyscs()
+    runs = []
+    with tempfile.TemporaryDirectory() as folder:
+        controls_file = os.path.join(folder, "controls.csv")
+        result_file = os.path.join(folder, "result.json")
+        with open(controls_file, "w") as f:
+            f.write(generate_controls(rng, pyscs, args.controls))
+        with open(os.path.join(folder, "model.py"), "w") as f:
+            f.write(generate_model(rng, pyscs, args, controls_file, result_file))
+        for i in range(args.runs):
+            runs.append(run(folder, result_file))
+
+    median = dict((p, statistics.median(r["timings"][p] for r in runs)) for p in PHASES)
+    results = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "parameters": dict(elements=args.elements, boundaries=args.boundaries, flows=args.flows, controls=args.controls, seed=args.seed),
+        "findings": runs[0]["findings"],
+        "runs": [r["timings"] for r in runs],
+        "median": median,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    print("{:<20} {:>12} {:>12}".format("phase", "min (ms)", "median (ms)"))
+    for phase in PHASES:
+        print("{:<20} {:>12.1f} {:>12.1f}".format(phase, min(r["timings"][phase] for r in runs) * 1000, median[phase] * 1000))
+    print("{} findings".format(results["findings"]))
+
+
+if __name__ == "__main__":
+    main()
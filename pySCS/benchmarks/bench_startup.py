@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Measures the wall clock time of CLI invocations that don't render anything,
+# next to the cost of importing the heavy dependencies on their own.
+#
+# usage: python benchmarks/bench_startup.py [--runs N]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PYSCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+COMMANDS = [
+    ("python", [sys.executable, "-c", "pass"]),
+    ("import pandas", [sys.executable, "-c", "import pandas"]),
+    ("import pydot", [sys.executable, "-c", "import pydot"]),
+    ("import pypandoc", [sys.executable, "-c", "import pypandoc"]),
+    ("--describe", [sys.executable, "pySCS.py", "models/sample", "--describe", "Datastore"]),
+    ("--list", [sys.executable, "pySCS.py", "models/sample", "--list", "--nocache"]),
+    ("--listfull", [sys.executable, "pySCS.py", "models/sample", "--listfull", "--nocache"]),
+]
+
+
+def measure(command, runs):
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=PYSCS_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10, help="number of runs per command (default = 10)")
+    args = parser.parse_args()
+
+    print("{:<16} {:>10} {:>10}".format("command", "min (ms)", "median (ms)"))
+    for name, command in COMMANDS:
+        timings = measure(command, args.runs)
+        if timings is None:
+            print("{:<16} {:>10}".format(name, "failed"))
+            continue
+        print("{:<16} {:>10.1f} {:>10.1f}".format(name, min(timings) * 1000, statistics.median(timings) * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from .context import pySCS
+
+
+@pytest.fixture
+def main(monkeypatch):
+    ''' pySCS.main, with the options and formats it sets globally restored afterwards '''
+    for name in ("_args", "report_formats", "dfd_formats", "export_formats"):
+        monkeypatch.setattr(pySCS, name, getattr(pySCS, name))
+    monkeypatch.setattr(pySCS.SCS, "_template", pySCS.SCS._template)
+    return pySCS.main
+
+
+@pytest.fixture
+def model(tmp_path):
+    ''' writes a JSON Lines model of records to a folder of its own; returns the folder '''
+    def write(records, name="model"):
+        folder = tmp_path / name
+        folder.mkdir()
+        (folder / "model.jsonl").write_text("".join(json.dumps(r) + "\n" for r in records))
+        return folder
+    return write
@@ -0,0 +1,25 @@
+import io
+import json
+
+import pytest
+
+from .context import pySCS
+
+
+def findings(elements):
+    return [pySCS.Finding(element, "not hardened", "HA01", "Server") for element in elements]
+
+
+@pytest.mark.parametrize("partition_bytes", [pySCS._DIFF_PARTITION_BYTES, 64])
+def test_diff_findings(tmp_path, monkeypatch, partition_bytes):
+    monkeypatch.setattr(pySCS, "_DIFF_PARTITION_BYTES", partition_bytes)
+    baseline = tmp_path / "findings.jsonl"
+    # a finding repeated in the baseline is matched once per occurrence
+    baseline.write_text("".join(json.dumps(f.record()) + "\n" for f in findings(["a", "b", "b", "c", "d"])))
+    out = io.StringIO()
+    counts = pySCS._diff_findings(findings(["b", "c", "d", "e", "f"]), str(baseline), out)
+    assert counts == {"added": 2, "removed": 2, "unchanged": 3}
+    lines = out.getvalue().splitlines()
+    assert sorted(lines[:-1]) == ["+ HA01 Server e: not hardened", "+ HA01 Server f: not hardened",
+                                  "- HA01 Server a: not hardened", "- HA01 Server b: not hardened"]
+    assert lines[-1] == "Findings compared with the baseline: 2 added, 2 removed, 3 unchanged"
@@ -0,0 +1,36 @@
+import json
+
+SHOP = [
+    {"type": "SCS", "name": "shop", "description": "a web shop"},
+    {"type": "Server", "name": "Web"},
+    {"type": "Datastore", "name": "Orders"},
+    {"type": "Dataflow", "name": "store", "source": "Web", "sink": "Orders"},
+]
+
+
+def test_summary_and_failures(model, main, tmp_path):
+    good = model(SHOP, "good")
+    bad = model(SHOP[:1] + [{"type": "Server", "name": "Web"}, {"type": "Server", "name": "Web"}], "bad")
+    missing = tmp_path / "missing"
+    missing.mkdir()
+    summary_file = tmp_path / "summary.json"
+    assert main([str(good), str(bad), str(missing), "--dot", "--summary", str(summary_file)]) == 1
+    summary = json.loads(summary_file.read_text())
+    assert (summary["models"], summary["failed"]) == (3, 2)
+    good_result, bad_result, missing_result = summary["results"]
+    assert "error" not in good_result and good_result["findings"] > 0
+    assert (good_result["elements"], good_result["dataflows"]) == (3, 1)
+    assert summary["findings"] == good_result["findings"]
+    assert bad_result["error"] == "ValueError: {}:3: Duplicate element name Web".format(bad / "model.jsonl")
+    assert missing_result["error"].startswith("FileNotFoundError: Model not found")
+    assert (good / "report.html").exists()
+
+
+def test_batch_over_processes_matches_one_process(model, main, tmp_path, capsys):
+    folders = [str(model(SHOP, "shop {}".format(i))) for i in range(3)]
+    summaries = []
+    for jobs in ("1", "2"):
+        assert main(folders + ["--dot", "--jobs", jobs]) == 0
+        summary = json.loads(capsys.readouterr().out)
+        summaries.append([(r["folder"], r["findings"]) for r in summary["results"]])
+    assert summaries[0] == summaries[1]
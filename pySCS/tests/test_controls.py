@@ -0,0 +1,162 @@
+import itertools
+import os
+import random
+
+import pytest
+
+from .context import pySCS
+
+ATTRIBUTES = ("inBoundary", "isHardened", "OS", "codeType", "name")
+OPERATORS = ("==", "!=", "<", "<=", ">", ">=", "is", "is not", "in", "not in")
+CONSTANTS = ("None", "True", "False", "'Linux'", "''", "0", "1", "['Linux', 'Windows']", "[None]", "[True]")
+
+
+def run_controls(conditions, target="Process"):
+    ''' findings of a model of 100 processes, half of them in a boundary, for a control per condition '''
+    session = pySCS.Session()
+    with session:
+        for n, condition in enumerate(conditions):
+            session.controls["T{}".format(n)] = {"description": condition, "condition": condition,
+                                                 "target": pySCS.str_to_class(target), "mitigation": ""}
+        scs = pySCS.SCS("vectorize")
+        scs.description = "equivalence of vectorized and per element evaluation"
+        boundary = pySCS.Boundary("inside")
+        for i in range(100):
+            p = pySCS.Process("process {}".format(i))
+            if i % 2 == 0:
+                p.inBoundary = boundary
+            if i % 3 == 0:
+                p.isHardened = True
+            if i % 5:
+                p.OS = ("Linux", "Windows", "")[i % 3]
+    return [(f.target, f.id) for f in session.process()]
+
+
+@pytest.mark.parametrize("attribute,operator", list(itertools.product(ATTRIBUTES, OPERATORS)))
+def test_vectorized_matches_per_element(attribute, operator, monkeypatch):
+    conditions = ["target.{} {} {}".format(attribute, operator, constant) for constant in CONSTANTS]
+    results = []
+    for minimum in (1, 10 ** 9):
+        monkeypatch.setattr(pySCS, "_VECTORIZE_MIN_ELEMENTS", minimum)
+        monkeypatch.setattr(pySCS, "_VECTORIZE_IMPORT_MIN_ELEMENTS", minimum)
+        for condition in conditions:
+            try:
+                results.append(run_controls([condition]))
+            except TypeError as e:
+                # python can't order these values, and neither path may pretend it can
+                results.append(type(e))
+    assert "pandas" in pySCS.sys.modules
+    half = len(conditions)
+    assert results[:half] == results[half:]
+
+
+def test_none_comparison(monkeypatch):
+    monkeypatch.setattr(pySCS, "_VECTORIZE_MIN_ELEMENTS", 1)
+    monkeypatch.setattr(pySCS, "_VECTORIZE_IMPORT_MIN_ELEMENTS", 1)
+    assert len(run_controls(["target.inBoundary == None"])) == 50
+    assert len(run_controls(["target.inBoundary != None"])) == 50
+
+
+def test_unknown_property_is_rejected_when_loaded():
+    content = b"ID;Description;Target;Condition;Mitigation\nT1;ok;Server;target.isHardened is False;\nT2;typo;Server;target.isHardend is False;\n"
+    with pytest.raises(ValueError, match="isHardend of Server in typo.csv, row 3"):
+        pySCS._parse_control_csv(content, "typo.csv")
+
+
+def test_missing_property_only_skipped_for_catch_all_targets():
+    with pytest.raises(AttributeError):
+        run_controls(["target.isHardend is False"])
+    assert run_controls(["target.isHardend is False"], target="Any") == []
+
+
+def test_control_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYSCS_CACHE", str(tmp_path))
+    content = b"ID;Description;Target;Condition;Mitigation\nT1;hardened;Server;target.isHardened is False;\n"
+    parsed = pySCS._read_control_rows(content, "cached.csv")
+    cache_file, = tmp_path.iterdir()
+    assert cache_file.suffix == ".json"
+    cached = pySCS._read_control_rows(content, "cached.csv")
+    assert cached == parsed
+    assert cached["T1"]["tree"] == ["atom", "target.isHardened is False"]
+    # a cache others can write to is parsed again, and replaced
+    cache_file.write_text(cache_file.read_text().replace("isHardened", "isResilient"))
+    cache_file.chmod(0o666)
+    assert pySCS._read_control_rows(content, "cached.csv")["T1"]["condition"] == "target.isHardened is False"
+
+
+def test_shared_atoms_match_eval():
+    rng = random.Random(3)
+    session = pySCS.Session()
+    with session:
+        for csv_file in ("default.csv", "gdpr.csv", "test_sample.csv", "test_sample2.csv"):
+            pySCS.import_control_list(csv_file)
+        scs = pySCS.SCS("atoms")
+        scs.description = "shared atoms against eval of the whole condition"
+        boundaries = [pySCS.Boundary("one"), pySCS.Boundary("two")]
+        elements = []
+        for cls in (pySCS.Actor, pySCS.Server, pySCS.Lambda, pySCS.ExternalEntity, pySCS.Datastore, pySCS.Process, pySCS.SetOfProcesses):
+            for i in range(8):
+                e = cls("{} {}".format(cls.__name__, i))
+                for name, value in pySCS._properties(e).items():
+                    if isinstance(value, bool):
+                        setattr(e, name, rng.random() < 0.5)
+                if i % 3:
+                    e.inBoundary = boundaries[i % 3 - 1]
+                elements.append(e)
+        for i in range(60):
+            flow = pySCS.Dataflow(rng.choice(elements), rng.choice(elements), "flow {}".format(i))
+            for name, value in pySCS._properties(flow).items():
+                if isinstance(value, bool):
+                    setattr(flow, name, rng.random() < 0.5)
+    session.process()
+    with session:
+        checked = []
+        for e in session.ListOfElements + session.ListOfFlows:
+            # the atoms of an element are shared by all its controls
+            values = {}
+            for control in session.ListOfControls:
+                if not isinstance(e, control.target):
+                    continue
+                try:
+                    expected = eval(control.condition, vars(pySCS), {"target": e}) is True
+                except AttributeError:
+                    expected = False
+                assert (control.apply(e, values) is True) == expected, (control.id, e.name)
+                checked.append(expected)
+    assert len(checked) > 1000 and any(checked) and not all(checked)
+
+
+def test_control_cache_under_group_writable_umask(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYSCS_CACHE", str(tmp_path))
+    parsed = []
+    parse = pySCS._parse_control_csv
+    monkeypatch.setattr(pySCS, "_parse_control_csv", lambda *args: parsed.append(args) or parse(*args))
+    content = b"ID;Description;Target;Condition;Mitigation\nT1;hardened;Server;target.isHardened is False;\n"
+    umask = os.umask(0o002)
+    try:
+        pySCS._read_control_rows(content, "umask.csv")
+        pySCS._read_control_rows(content, "umask.csv")
+    finally:
+        os.umask(umask)
+    cache_file, = tmp_path.iterdir()
+    assert cache_file.stat().st_mode & 0o777 == 0o600
+    assert len(parsed) == 1
+
+
+def test_pandas_is_only_imported_for_huge_models(monkeypatch):
+    tables = []
+
+    def element_table(elements):
+        # stands in for the table, which would import pandas
+        tables.append(len(elements))
+        raise AssertionError("vectorized")
+
+    monkeypatch.setattr(pySCS, "_ElementTable", element_table)
+    monkeypatch.delitem(pySCS.sys.modules, "pandas", raising=False)
+    monkeypatch.setattr(pySCS, "_VECTORIZE_MIN_ELEMENTS", 1)
+    run_controls(["target.isHardened is True"])
+    assert tables == []
+    monkeypatch.setattr(pySCS, "_VECTORIZE_IMPORT_MIN_ELEMENTS", 100)
+    with pytest.raises(AssertionError, match="vectorized"):
+        run_controls(["target.isHardened is True"])
+    assert tables
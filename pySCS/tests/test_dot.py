@@ -0,0 +1,22 @@
+from .context import pySCS
+
+
+def test_lines():
+    graph = pySCS.DotGraph("DFD", labelloc="t")
+    graph.set_defaults("node", fontname="Arial")
+    cluster = graph.add_cluster("b1", label='Share "C:\\temp\\"')
+    cluster.add_node("n1", label="C:\\temp\\", shape="square")
+    graph.add_node("n2", label="plain")
+    graph.add_edge("n1", "n2", label="copy", weight=2)
+    assert list(graph.lines()) == [
+        'digraph "DFD" {',
+        '    labelloc="t";',
+        '    node [fontname="Arial"];',
+        '    subgraph "cluster_b1" {',
+        '        label="Share \\"C:\\\\temp\\\\\\"";',
+        '        "n1" [label="C:\\\\temp\\\\", shape="square"];',
+        '    }',
+        '    "n2" [label="plain"];',
+        '    "n1" -> "n2" [label="copy", weight="2"];',
+        '}',
+    ]
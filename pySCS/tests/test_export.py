@@ -0,0 +1,27 @@
+import csv
+import json
+
+from .context import pySCS
+
+MODEL = [
+    {"type": "SCS", "name": "export", "description": "findings in every format"},
+    {"type": "Boundary", "name": "DMZ"},
+    {"type": "Server", "name": "Web, \"public\"", "inBoundary": "DMZ"},
+    {"type": "Datastore", "name": "Orders", "inScope": False},
+    {"type": "Dataflow", "name": "store", "source": "Web, \"public\"", "sink": "Orders"},
+]
+
+
+def test_formats_hold_the_same_findings(model, main):
+    folder = model(MODEL)
+    assert main([str(folder), "--dot", "--export", "jsonl,csv,parquet"]) == 0
+    records = [json.loads(line) for line in (folder / "findings.jsonl").read_text().splitlines()]
+    assert records and all(list(r) == list(pySCS._EXPORT_COLUMNS) for r in records)
+    assert {r["boundary"] for r in records if r["element"] == 'Web, "public"'} == {"DMZ"}
+    with open(str(folder / "findings.csv"), newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [dict(r, inScope=r["inScope"] == "True") for r in rows] == records
+    import pandas
+    frame = pandas.read_parquet(str(folder / "findings.parquet"))
+    assert list(frame.columns) == list(pySCS._EXPORT_COLUMNS)
+    assert frame.to_dict("records") == records
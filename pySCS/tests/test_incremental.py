@@ -0,0 +1,36 @@
+import json
+
+from .context import pySCS
+
+
+def process(folder, servers):
+    ''' processes a model of the given servers; returns the findings '''
+    records = [{"type": "SCS", "name": "incremental", "description": "servers", "controls": ["default.csv"]}]
+    records += [dict(server, type="Server") for server in servers]
+    model_file = folder / "model.jsonl"
+    model_file.write_text("".join(json.dumps(r) + "\n" for r in records))
+    findings = pySCS.Session(str(folder)).load(str(model_file)).process()
+    return sorted((f.target, f.id) for f in findings)
+
+
+def test_unchanged_elements_are_reused(tmp_path, monkeypatch):
+    evaluated = []
+    evaluate = pySCS._evaluate_controls
+
+    def evaluate_controls(elements, jobs=1):
+        evaluated.extend(e.name for e in elements)
+        return evaluate(elements, jobs)
+
+    monkeypatch.setattr(pySCS, "_evaluate_controls", evaluate_controls)
+    monkeypatch.setattr(pySCS._args, "dot", True)
+    monkeypatch.setattr(pySCS._args, "incremental", True)
+    servers = [{"name": "server {}".format(i), "isHardened": i % 2 == 0} for i in range(10)]
+    first = process(tmp_path, servers)
+    assert len(evaluated) == 10
+    del evaluated[:]
+    servers[3]["isHardened"] = True
+    second = process(tmp_path, servers)
+    assert evaluated == ["server 3"]
+    # the reused findings are those of a full run
+    monkeypatch.setattr(pySCS._args, "incremental", False)
+    assert second == process(tmp_path, servers) != first
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from .context import pySCS
+
+
+def write_model(folder, records, name="model.jsonl"):
+    model_file = folder / name
+    model_file.write_text("".join(json.dumps(r) + "\n" for r in records))
+    return str(model_file)
+
+
+def test_element_before_its_boundary(tmp_path, monkeypatch):
+    monkeypatch.setattr(pySCS._args, "dot", True)
+    model_file = write_model(tmp_path, [
+        {"type": "SCS", "name": "forward", "description": "boundary defined after its element"},
+        {"type": "Server", "name": "Web", "inBoundary": "DMZ", "isHardened": True},
+        {"type": "Actor", "name": "User"},
+        {"type": "Dataflow", "name": "request", "source": "User", "sink": "Web"},
+        {"type": "Boundary", "name": "DMZ"},
+    ])
+    session = pySCS.Session(str(tmp_path)).load(model_file)
+    session.process()
+    dfd = (tmp_path / "dfd.dot").read_text()
+    cluster = dfd.index('label="DMZ"')
+    assert dfd.index('label="Web"', cluster) < dfd.index("}", cluster)
+    assert session.elementsByName["Web"].inBoundary is session.boundariesByName["DMZ"]
+
+
+def test_control_lists_must_be_a_list(tmp_path):
+    model_file = write_model(tmp_path, [{"type": "SCS", "name": "string", "description": "", "controls": "default.csv"}])
+    with pytest.raises(ValueError, match="model.jsonl:1: controls must be a list of control list files, not 'default.csv'"):
+        pySCS.Session().load(model_file)
+
+
+def test_control_lists_outside_the_controls_folder(tmp_path):
+    for controls in (["../controls/default.csv"], ["/etc/passwd"], [["default.csv"]]):
+        model_file = write_model(tmp_path, [{"type": "SCS", "name": "paths", "description": "", "controls": controls}])
+        with pytest.raises(ValueError, match="controls folder"):
+            pySCS.Session().load(model_file)
+
+
+RECORDS = [
+    {"type": "SCS", "name": "shop", "description": "the same model in python and json lines", "controls": ["default.csv"]},
+    {"type": "Boundary", "name": "DMZ"},
+    {"type": "Actor", "name": "Customer"},
+    {"type": "Server", "name": "Web", "inBoundary": "DMZ", "OS": "Linux"},
+    {"type": "Datastore", "name": "Orders", "isSQL": True, "isEncrypted": True},
+    {"type": "Dataflow", "name": "order", "source": "Customer", "sink": "Web", "protocol": "HTTPS", "isEncrypted": True},
+    {"type": "Dataflow", "name": "store", "source": "Web", "sink": "Orders", "protocol": "SQL"},
+]
+
+MODEL = '''import_control_list("default.csv")
+scs = SCS("shop")
+scs.description = "the same model in python and json lines"
+dmz = Boundary("DMZ")
+customer = Actor("Customer")
+web = Server("Web")
+web.inBoundary = dmz
+web.OS = "Linux"
+orders = Datastore("Orders")
+orders.isSQL = True
+orders.isEncrypted = True
+order = Dataflow(customer, web, "order")
+order.protocol = "HTTPS"
+order.isEncrypted = True
+store = Dataflow(web, orders, "store")
+store.protocol = "SQL"
+'''
+
+
+def test_declarative_matches_python(tmp_path):
+    (tmp_path / "model.py").write_text(MODEL)
+    python = pySCS.Session().load(str(tmp_path / "model.py")).process()
+    declarative = pySCS.Session().load(write_model(tmp_path, RECORDS)).process()
+    assert [f.record() for f in declarative] == [f.record() for f in python]
+    assert python
+
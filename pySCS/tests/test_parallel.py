@@ -0,0 +1,40 @@
+from .context import pySCS
+
+
+def test_jobs_on_a_long_chain():
+    session = pySCS.Session()
+    with session:
+        session.controls["T1"] = {"description": "reached by a dataflow", "condition": "len(target.inflows) > 0",
+                                  "target": pySCS.str_to_class("Server"), "mitigation": ""}
+        scs = pySCS.SCS("chain")
+        scs.description = "a chain of servers, each sending to the next"
+        servers = [pySCS.Server("server {}".format(i)) for i in range(1500)]
+        for i, (source, sink) in enumerate(zip(servers, servers[1:])):
+            pySCS.Dataflow(source, sink, "flow {}".format(i))
+    pySCS._args.jobs = 2
+    try:
+        findings = session.process()
+    finally:
+        pySCS._args.jobs = 1
+    assert [f.target for f in findings] == ["server {}".format(i) for i in range(1, 1500)]
+
+
+def test_jobs_fork_before_render_threads(tmp_path, monkeypatch):
+    pools = []
+
+    def apply_parallel(elements, pending, jobs):
+        pools.append(pySCS._session()._renderPool)
+        return None
+
+    monkeypatch.setattr(pySCS, "_apply_parallel", apply_parallel)
+    monkeypatch.setattr(pySCS._args, "jobs", 2)
+    monkeypatch.setattr(pySCS._args, "dot", True)
+    session = pySCS.Session(str(tmp_path))
+    with session:
+        session.controls["T1"] = {"description": "not hardened", "condition": "target.isHardened is False",
+                                  "target": pySCS.str_to_class("Server"), "mitigation": ""}
+        scs = pySCS.SCS("threads")
+        scs.description = "resolved while the report is rendered"
+        pySCS.Server("web")
+    session.process()
+    assert pools == [None]
@@ -0,0 +1,23 @@
+import io
+import pstats
+
+from .context import pySCS
+
+MODEL = [
+    {"type": "SCS", "name": "profile", "description": "timed"},
+    {"type": "Server", "name": "Web"},
+]
+
+
+def test_profile(model, main, monkeypatch):
+    monkeypatch.setattr(pySCS, "stderr", io.StringIO())
+    folder = model(MODEL)
+    assert main([str(folder), "--dot", "--profile"]) == 0
+    stats = pstats.Stats(str(folder / "profile.pstats"))
+    assert stats.total_calls > 0
+    err = pySCS.stderr.getvalue()
+    phases = err[err.index("\nphase "):err.index("\ncontrol ")]
+    for phase in ("model", "check", "dfd", "resolve", "report"):
+        assert "\n{} ".format(phase) in phases
+    # the controls of the model are timed, with their condition
+    assert "\nHA01 " in err and "target.isHardened is False" in err
@@ -0,0 +1,43 @@
+import pytest
+
+from .context import pySCS
+
+
+def test_duplicate_names():
+    session = pySCS.Session()
+    with session:
+        pySCS.Server("Web")
+        pySCS.Boundary("Web")
+        with pytest.raises(ValueError, match="Duplicate element name Web"):
+            pySCS.Datastore("Web")
+        with pytest.raises(ValueError, match="Duplicate boundary name Web"):
+            pySCS.Boundary("Web")
+    assert list(session.elementsByName) == ["Web"]
+
+
+def test_dfd_id_collision(monkeypatch):
+    monkeypatch.setattr(pySCS, "_uniq_name", lambda name: "abc")
+    session = pySCS.Session()
+    with session:
+        pySCS.Server("Web")
+        with pytest.raises(ValueError, match="Web and DB would have the same id abc"):
+            pySCS.Datastore("DB")
+
+
+def test_dataflow_ends(main):
+    session = pySCS.Session()
+    with session:
+        server = pySCS.Server("Web")
+        boundary = pySCS.Boundary("Web")
+        user = pySCS.Actor("User")
+        pySCS.Dataflow(user, server, "to server")
+        pySCS.Dataflow(user, boundary, "to boundary")
+        pySCS.initialize_dfd()
+        for flow in pySCS.SCS.ListOfFlows:
+            flow.dfd()
+    edges = [s for s in session._dfd.statements if s[0] == "edge"]
+    web, user = session._dfdIds[server], session._dfdIds[user]
+    assert edges == [
+        ("edge", (user, web), {"label": "to server"}),
+        ("edge", (user, "cluster_" + session._dfdIds[boundary]), {"label": "to boundary"}),
+    ]
@@ -0,0 +1,58 @@
+import io
+import os
+import shutil
+
+import pytest
+
+from .context import pySCS
+
+HERE = os.path.dirname(__file__)
+
+
+def to_html(markdown):
+    out = io.StringIO()
+    writer = pySCS.MarkdownHTMLWriter(out)
+    # in chunks that split lines, as templates are rendered
+    for n in range(0, len(markdown), 7):
+        writer.write(markdown[n:n + 7])
+    writer.close()
+    body = out.getvalue()
+    return body[body.index("<body>\n") + 7:body.index("</body>")]
+
+
+def test_sample_report_matches_golden(tmp_path, monkeypatch):
+    monkeypatch.setattr(pySCS._args, "dot", True)
+    shutil.copy(os.path.join(HERE, "..", "models", "sample", "model.py"), str(tmp_path))
+    pySCS.Session(str(tmp_path)).load(str(tmp_path / "model.py")).process()
+    with open(os.path.join(HERE, "golden", "sample_report.html"), encoding="utf-8") as f:
+        assert (tmp_path / "report.html").read_text(encoding="utf-8") == f.read()
+
+
+def test_lists():
+    assert to_html("- one\n- two\n  continued\n  - nested\n- three\n\n3. third\n4. fourth\n\nafter\n") == (
+        "<ul>\n<li>one</li>\n<li>two continued\n<ul>\n<li>nested</li>\n</ul>\n</li>\n<li>three</li>\n</ul>\n"
+        '<ol start="3">\n<li>third</li>\n<li>fourth</li>\n</ol>\n<p>after</p>\n')
+
+
+def test_fenced_code():
+    assert to_html("```python\nif a < b | c:\n    pass\n```\n~~~\n- not a list\n~~~\n") == (
+        '<pre><code class="language-python">if a &lt; b | c:\n    pass\n</code></pre>\n'
+        "<pre><code>- not a list\n</code></pre>\n")
+
+
+def test_blockquote():
+    assert to_html("> quoted *text*\nlazy\n>\n> second\n\nafter\n") == (
+        "<blockquote>\n<p>quoted <em>text</em> lazy</p>\n<p>second</p>\n</blockquote>\n<p>after</p>\n")
+
+
+def test_template_fields_match_format():
+    from types import SimpleNamespace
+    context = {
+        "scs": SimpleNamespace(name="Shop", tags={"web": ["a", "b"]}, items=[SimpleNamespace(id=3)]),
+        "rows": ["x", "y"],
+    }
+    template = "{scs.name!r} {scs.tags[web][1]} {scs.items[0].id:03d} {rows:repeat:<{{item}}>}"
+    plan = pySCS.SuperFormatter().compile(template)
+    assert "".join(plan.render(context)) == "'Shop' b 003 <x><y>"
+    with pytest.raises(ValueError, match="Invalid field name 'scs.'"):
+        pySCS.SuperFormatter().compile("{scs.}")
@@ -0,0 +1,74 @@
+import http.client
+import io
+import json
+import threading
+
+import pytest
+
+from .context import pySCS
+
+MODEL = {"name": "served", "description": "a model sent to the service",
+         "elements": [{"type": "Server", "name": "Web"}]}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    ''' runs the service on a free port; returns a function that sends a request and returns the status and answer '''
+    monkeypatch.setattr(pySCS, "stderr", io.StringIO())
+    servers = []
+    started = threading.Event()
+
+    def start(server):
+        servers.append(server)
+        started.set()
+
+    thread = threading.Thread(target=pySCS._serve, args=(0, start))
+    thread.start()
+    assert started.wait(30)
+    port = servers[0].server_address[1]
+
+    def request(method, path, body=None, headers=None):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        try:
+            connection.request(method, path, body, headers or {})
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    yield request
+    servers[0].shutdown()
+    thread.join(30)
+
+
+def test_health(service):
+    status, answer = service("GET", "/health")
+    assert (status, answer["status"]) == (200, "ok")
+
+
+def test_json_model(service):
+    status, answer = service("POST", "/findings", json.dumps(MODEL), {"Content-Type": "application/json"})
+    assert status == 200
+    assert answer["elements"] == 1 and answer["controls"] > 0
+    assert ("HA01", "Web") in [(f["id"], f["element"]) for f in answer["findings"]]
+
+
+@pytest.mark.parametrize("headers", [{"Host": "attacker.example:80"}, {"Origin": "http://attacker.example"}])
+def test_requests_from_web_pages_are_refused(service, headers):
+    status, answer = service("POST", "/findings", json.dumps(MODEL), dict(headers, **{"Content-Type": "application/json"}))
+    assert status == 403
+
+
+def test_python_models_are_refused_by_default(service):
+    for content_type in ("text/plain", "text/x-python"):
+        status, answer = service("POST", "/findings", "scs = SCS('served')", {"Content-Type": content_type})
+        assert status == 415
+
+
+@pytest.mark.parametrize("headers,body", [
+    ({"Content-Length": "many"}, b""),
+    ({}, b"\xff\xfe not utf-8"),
+])
+def test_malformed_requests_are_answered(service, headers, body):
+    status, answer = service("POST", "/findings", body, dict(headers, **{"Content-Type": "application/json"}))
+    assert status == 400
@@ -0,0 +1,38 @@
+MODEL = [
+    {"type": "SCS", "name": "split", "description": "two boundaries, one named like an element"},
+    {"type": "Boundary", "name": "DMZ"},
+    {"type": "Boundary", "name": "Web"},
+    {"type": "Actor", "name": "User"},
+    {"type": "Server", "name": "Web", "inBoundary": "DMZ"},
+    {"type": "Process", "name": "Api", "inBoundary": "DMZ"},
+    {"type": "Datastore", "name": "Orders", "inBoundary": "Web"},
+    {"type": "Dataflow", "name": "browse", "source": "User", "sink": "Web"},
+    {"type": "Dataflow", "name": "call", "source": "Web", "sink": "Api"},
+    {"type": "Dataflow", "name": "read", "source": "Api", "sink": "Orders"},
+    {"type": "Dataflow", "name": "write", "source": "Api", "sink": "Orders"},
+]
+
+
+def labels(dot, color):
+    ''' the labels of the nodes drawn in color '''
+    return sorted(line.split('label="')[1].split('"')[0] for line in dot.splitlines()
+                  if '" [label=' in line and 'color="{}"'.format(color) in line)
+
+
+def test_diagram_per_boundary_and_overview(model, main):
+    folder = model(MODEL)
+    assert main([str(folder), "--dot", "--split"]) == 0
+    dmz = (folder / "dfd_DMZ.dot").read_text()
+    assert labels(dmz, "black") == ["Api", "Web"]
+    # the other ends of dataflows that cross the boundary are greyed out
+    assert labels(dmz, "grey69") == ["Orders", "User"]
+    web = (folder / "dfd_Web.dot").read_text()
+    assert (labels(web, "black"), labels(web, "grey69")) == (["Orders"], ["Api"])
+    overview = (folder / "dfd.dot").read_text()
+    # a node per boundary, and the elements outside boundaries
+    assert (labels(overview, "firebrick2"), labels(overview, "black")) == (["DMZ", "Web"], ["User"])
+    edges = [line.strip() for line in overview.splitlines() if " -> " in line]
+    assert len(edges) == 2
+    # the two dataflows from DMZ to the Web boundary are aggregated, the one inside DMZ is left out
+    assert edges[1].endswith('[label="2 dataflows", weight="2", penwidth="1.5"];')
+    assert edges[1].startswith('"cluster_') and edges[1].count('"cluster_') == 2
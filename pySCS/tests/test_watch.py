@@ -0,0 +1,33 @@
+import io
+import os
+
+from .context import pySCS
+
+
+def test_outputs_of_a_run_are_not_watched(tmp_path):
+    for name in ("model.jsonl", "helpers.py", "findings.jsonl", "findings.csv", ".pyscs-state.json", "profile.pstats", "notes.json"):
+        (tmp_path / name).write_text("")
+    watched = set(os.path.basename(f) for f in pySCS._watched_files(str(tmp_path / "model.jsonl")))
+    assert {"model.jsonl", "helpers.py"} <= watched
+    assert not watched & {"findings.jsonl", "findings.csv", ".pyscs-state.json", "profile.pstats", "notes.json"}
+
+
+def test_runs_again_when_a_source_changes(tmp_path, monkeypatch):
+    model_file = tmp_path / "model.jsonl"
+    model_file.write_text('{"type": "SCS", "name": "watched", "description": "first"}\n')
+    runs = []
+    monkeypatch.setattr(pySCS, "_run_model", lambda f: runs.append(model_file.read_text()))
+    monkeypatch.setattr(pySCS, "stderr", io.StringIO())
+    polls = []
+
+    def sleep(seconds):
+        polls.append(seconds)
+        if len(polls) == 2:
+            model_file.write_text('{"type": "SCS", "name": "watched", "description": "second"}\n')
+            os.utime(str(model_file), ns=(0, 10 ** 9))
+        elif len(polls) == 4:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(pySCS.time, "sleep", sleep)
+    pySCS._watch(str(model_file))
+    assert [run.split('"description": ')[1] for run in runs] == ['"first"}\n', '"second"}\n']